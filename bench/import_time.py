@@ -0,0 +1,44 @@
+"""
+`import dzfile`的导入时间基准测试
+
+在新的解释器进程中反复导入`dzfile`，和空解释器的启动时间比较，输出导入的额外耗时。
+
+用法：
+    `python bench/import_time.py [次数]`
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(code: str, repeat: int) -> list[float]:
+    """
+    在新的解释器进程中执行`code`，返回每次的耗时（秒）
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    baseline = statistics.median(measure('pass', repeat))
+    cases = {
+        'import dzfile': 'import dzfile',
+        'parse BMP': "import dzfile; dzfile.parse('test/30755992.bmp')",
+    }
+    print(f'python startup: {baseline * 1000:.2f} ms')
+    for name, code in cases.items():
+        cost = statistics.median(measure(code, repeat)) - baseline
+        print(f'{name}: +{cost * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+模块名：`AsyncStream`
+
+为序列器的`aparse`提供异步输入流接口。
+
+使用方式：
+    `from dzfile.AsyncStream import AsyncFileReader, AsyncStreamReader`
+
+包含类：
+    - `AsyncReader`: 异步输入流基类
+    - `AsyncFileReader`: 本地文件的异步输入流，阻塞的读取在线程池中执行
+    - `AsyncStreamReader`: 基于`asyncio.StreamReader`的异步输入流
+
+包含方法：
+    - `get_default_executor`: 获取默认的有界线程池
+"""
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Literal
+from .Blob import Blob
+from .FileStream import DEFAULT_BLOB_THRESHOLD
+
+INLINE_DECODE_SIZE = 64 << 10
+"""
+`aparse`解析不超过该大小的数据时直接在事件循环中解码，超过时在线程池中解码
+"""
+
+_default_executor: Executor = None
+
+
+def get_default_executor() -> Executor:
+    """
+    获取默认的有界线程池，用于阻塞的文件读取和较大数据的解码
+    """
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = ThreadPoolExecutor(
+            min(32, (os.cpu_count() or 1) + 4), thread_name_prefix='dzfile')
+    return _default_executor
+
+
+class AsyncReader(ABC):
+    """
+    异步输入流基类，子类需要实现`_read`
+
+    支持`unread`把已经读取的数据放回流的开头，用于在不可`seek`的流上先解析文件头再解析整个模板。
+    """
+
+    def __init__(self, byteorder: Literal['little', 'big'] = 'little'):
+        assert byteorder in ('little', 'big'), "端序必须是'little'或者'big'"
+        self.byteorder = byteorder
+        self.pushback = b''
+
+    @abstractmethod
+    async def _read(self, n: int = -1) -> bytes:
+        """
+        从底层读取最多n个字节，负数代表读取剩下的所有数据
+        """
+
+    async def read(self, n: int = -1) -> bytes:
+        """
+        读取n个字节，负数代表读取剩下的所有数据，数据不足时返回剩下的数据
+        """
+        data = self.pushback
+        if n < 0:
+            self.pushback = b''
+            return data + await self._read(-1)
+        if len(data) >= n:
+            self.pushback = data[n:]
+            return data[:n]
+        self.pushback = b''
+        return data + await self._read(n - len(data))
+
+    def unread(self, data: bytes):
+        """
+        把数据放回流的开头
+        """
+        self.pushback = data + self.pushback
+
+    async def at_eof(self) -> bool:
+        """
+        是否已经没有数据
+        """
+        if self.pushback:
+            return False
+        data = await self._read(1)
+        self.unread(data)
+        return not data
+
+    async def DATA(self, n: int = 1):
+        """
+        获取n个字节，负数代表剩下的所有数据
+        """
+        return await self.read(n)
+
+    def endian(self, byteorder: Literal['little', 'big']):
+        """
+        修改输入流读入的端序
+        """
+        assert byteorder in ('little', 'big'), "端序必须是'little'或者'big'"
+        self.byteorder = byteorder
+
+    async def close(self):
+        pass
+
+
+class AsyncFileReader(AsyncReader):
+    """
+    本地文件的异步输入流，阻塞的读取在`executor`中执行，不会阻塞事件循环
+    """
+
+    def __init__(self, filename: str, byteorder: Literal['little', 'big'] = 'little',
+                 blob_threshold: int = DEFAULT_BLOB_THRESHOLD, executor: Executor = None):
+        """
+        参数：
+            - filename: 文件名
+            - byteorder: 端序
+            - blob_threshold: `DATA`超过该大小时返回`Blob`句柄，`None`代表总是读取为`bytes`
+            - executor: 执行阻塞读取的`Executor`，默认为`get_default_executor()`
+        """
+        super().__init__(byteorder)
+        self.filename = filename
+        self.file = None   # 第一次读取时在`executor`中打开
+        self.blob_threshold = blob_threshold
+        self.executor = executor or get_default_executor()
+
+    async def _open(self):
+        """
+        在`executor`中打开文件，不阻塞事件循环
+        """
+        if self.file is None:
+            loop = asyncio.get_running_loop()
+            self.file = await loop.run_in_executor(self.executor, open, self.filename, 'rb')
+        return self.file
+
+    async def _read(self, n: int = -1) -> bytes:
+        file = await self._open()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, file.read, n)
+
+    async def DATA(self, n: int = 1):
+        """
+        获取n个字节，负数代表剩下的所有数据，超过`blob_threshold`时返回`Blob`句柄
+        """
+        if self.blob_threshold is not None and not self.pushback and (n < 0 or n > self.blob_threshold):
+            file = await self._open()
+            pos = file.tell()
+            remain = max(os.fstat(file.fileno()).st_size - pos, 0)
+            size = remain if n < 0 else min(n, remain)
+            if size > self.blob_threshold:
+                file.seek(pos + size)
+                return Blob(os.path.abspath(self.filename), pos, size)
+        return await self.read(n)
+
+    async def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class AsyncStreamReader(AsyncReader):
+    """
+    基于`asyncio.StreamReader`的异步输入流
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, byteorder: Literal['little', 'big'] = 'little'):
+        super().__init__(byteorder)
+        self.reader = reader
+
+    async def _read(self, n: int = -1) -> bytes:
+        if n < 0:
+            return await self.reader.read(-1)
+        try:
+            return await self.reader.readexactly(n)
+        except asyncio.IncompleteReadError as e:
+            return e.partial
@@ -1,5 +1,12 @@
 from .Common import *
 from enum import IntEnum, unique
+from functools import lru_cache
+import io
+
+SCHEMA_VERSION = 2
+"""
+解析结果结构的版本，修改模板后需要递增，用于使解析缓存失效
+"""
 
 
 class BMPFileHeader(Serializer):
@@ -63,13 +70,41 @@ class CompressionType(IntEnum):
     BI_ALPHABITFIELDS = 6
 
 
-def parse(stream: FileReader):
+def row_size(width: int, bit_count: int) -> int:
     """
-    解析Bitmap文件
+    计算未压缩Bitmap每行数据的大小，包含对齐到4字节的填充
+    """
+    return (abs(width) * bit_count + 31) // 32 * 4
+
+
+@lru_cache(maxsize=None)
+def line_template(width: int, bit_count: int):
+    """
+    根据宽度和每像素位数生成Bitmap行的解析器模板，相同参数返回同一个模板，模板可以被`pickle`
+    """
+    # 计算填充，不足一字节的像素向上取整
+    bytesPerLine = (abs(width) * bit_count + 7) // 8
+    padding = row_size(width, bit_count) - bytesPerLine
+
+    class BMPLine(Serializer):
+        FACTORY = (line_template, (width, bit_count))
+        if bit_count < 8 or bit_count == 16:
+            imageData: DATA(bytesPerLine)
+        elif bit_count == 8:
+            colorIndex: DATA(abs(width))
+        elif bit_count == 24:
+            colors: ARRAY(RGB, abs(width))
+        elif bit_count == 32:
+            colors: ARRAY(RGBR, abs(width))
+        if padding > 0:
+            padBytes: DATA(padding)
+    return BMPLine
+
+
+def template(_fileHeader: BMPFileHeader, _infoHeader: BMPInfoHeader):
+    """
+    根据文件头和数据头生成Bitmap文件的解析器模板
     """
-    start_pos = stream.tell()
-    _fileHeader = BMPFileHeader.parse(stream)
-    _infoHeader = BMPInfoHeader.parse(stream)
     unkown_size = _fileHeader.bfOffBits - \
         serializer_size(BMPFileHeader) - serializer_size(BMPInfoHeader)
     if _infoHeader.biCompression > 0:
@@ -84,21 +119,7 @@ def parse(stream: FileReader):
             else:
                 rleData: DATA(_fileHeader.bfSize - _fileHeader.bfOffBits)
     else:
-        # 计算填充
-        bytesPerLine = _infoHeader.biWidth * _infoHeader.biBitCount // 8
-        padding = 4 - (bytesPerLine % 4)
-
-        class BMPLine(Serializer):
-            if _infoHeader.biBitCount < 8:
-                imageData: DATA(bytesPerLine)
-            elif _infoHeader.biBitCount == 8:
-                colorIndex: DATA(_infoHeader.biWidth)
-            elif _infoHeader.biBitCount == 24:
-                colors: ARRAY(RGB, _infoHeader.biWidth)
-            elif _infoHeader.biBitCount == 32:
-                colors: ARRAY(RGBR, _infoHeader.biWidth)
-            if (padding != 4):
-                padBytes: DATA(padding)
+        BMPLine = line_template(_infoHeader.biWidth, _infoHeader.biBitCount)
 
         class Bitmap(Serializer):
             fileHeader: BMPFileHeader
@@ -106,5 +127,154 @@ def parse(stream: FileReader):
             if unkown_size > 0:
                 unkown: DATA(unkown_size)
             lines: ARRAY(BMPLine, abs(_infoHeader.biHeight))
+    return Bitmap
+
+
+def parse(stream: FileReader):
+    """
+    解析Bitmap文件
+    """
+    start_pos = stream.tell()
+    _fileHeader = BMPFileHeader.parse(stream)
+    _infoHeader = BMPInfoHeader.parse(stream)
+    Bitmap = template(_fileHeader, _infoHeader)
     stream.seek(start_pos)
     return Bitmap.parse(stream)
+
+
+async def aparse(stream):
+    """
+    异步解析Bitmap文件，`stream`为`AsyncReader`
+    """
+    head = await stream.read(serializer_size(BMPFileHeader) + serializer_size(BMPInfoHeader))
+    header_stream = BytesReader(head, stream.byteorder)
+    _fileHeader = BMPFileHeader.parse(header_stream)
+    _infoHeader = BMPInfoHeader.parse(header_stream)
+    Bitmap = template(_fileHeader, _infoHeader)
+    # 流不一定可以seek，把文件头放回去
+    stream.unread(head)
+    return await Bitmap.aparse(stream)
+
+
+def parse_parallel(path: str, workers: int = None, executor=None):
+    """
+    并行解析Bitmap文件，按行切分`lines`后并发解析，压缩的Bitmap没有`lines`，会顺序解析
+    """
+    stream = FileReader(path)
+    _fileHeader = BMPFileHeader.parse(stream)
+    _infoHeader = BMPInfoHeader.parse(stream)
+    stream.close()
+    Bitmap = template(_fileHeader, _infoHeader)
+    if 'lines' not in Bitmap.__annotations__:
+        stream = FileReader(path)
+        bitmap = Bitmap.parse(stream)
+        stream.close()
+        return bitmap
+    return Bitmap.parse_parallel(path, 'lines', workers, executor)
+
+
+def encode(buffer, width: int, height: int, bit_count: int = 24, palette: bytes = b'',
+           stream: FileWriter = None):
+    """
+    从连续的像素缓冲区直接生成未压缩的Bitmap文件，不为每个像素创建对象
+
+    参数：
+        - buffer: 支持缓冲区协议的像素数据，例如`bytes`、`memoryview`或C连续的`ndarray`，
+          每行`(abs(width) * bit_count + 7) // 8`字节，不含填充，
+          行的顺序与Bitmap的存储顺序一致，即`height`为正时自下而上，为负时自上而下
+        - width: 图像宽度
+        - height: 图像高度
+        - bit_count: 每个像素的位数
+        - palette: 调色板，每项为4字节的`RGBR`，`bit_count`不超过8时需要提供
+        - stream: 可选的`FileWriter`，提供时写入其中
+    返回值：
+        未提供`stream`时返回Bitmap文件的`bytes`，否则无
+    """
+    assert bit_count in (1, 4, 8, 16, 24, 32), "bit_count必须是1, 4, 8, 16, 24或32"
+    assert len(palette) % serializer_size(RGBR) == 0, "调色板大小必须是4的倍数"
+    assert bit_count > 8 or palette, "bit_count不超过8时需要提供调色板"
+    pixels = memoryview(buffer).cast('B')
+    lines = abs(height)
+    bytesPerLine = (abs(width) * bit_count + 7) // 8
+    lineSize = row_size(width, bit_count)
+    assert len(pixels) == bytesPerLine * lines, \
+        f"像素数据需要{bytesPerLine * lines}字节，实际为{len(pixels)}字节"
+
+    offBits = serializer_size(BMPFileHeader) + serializer_size(BMPInfoHeader) + len(palette)
+    _fileHeader = BMPFileHeader()
+    _fileHeader.bfType = b'BM'
+    _fileHeader.bfSize = offBits + lineSize * lines
+    _fileHeader.bfReserved1 = 0
+    _fileHeader.bfReserved2 = 0
+    _fileHeader.bfOffBits = offBits
+    _infoHeader = BMPInfoHeader()
+    _infoHeader.biSize = serializer_size(BMPInfoHeader)
+    _infoHeader.biWidth = width
+    _infoHeader.biHeight = height
+    _infoHeader.biPlanes = 1
+    _infoHeader.biBitCount = bit_count
+    _infoHeader.biCompression = CompressionType.BI_RGB
+    _infoHeader.biSizeImage = lineSize * lines
+    _infoHeader.biXPelsPerMeter = 2835
+    _infoHeader.biYPelsPerMeter = 2835
+    _infoHeader.biClrUsed = len(palette) // serializer_size(RGBR)
+    _infoHeader.biClrImportant = 0
+
+    output = None
+    if stream is None:
+        output = io.BytesIO()
+        stream = FileWriter(output)
+    _fileHeader.dump(stream)
+    _infoHeader.dump(stream)
+    if palette:
+        stream.DATA(palette)
+    if lineSize == bytesPerLine:
+        # 没有填充，整块写入
+        stream.DATA(pixels)
+    else:
+        # 按块补齐每行的填充，每块大约4 MiB
+        band_lines = max(1, (4 << 20) // lineSize)
+        band = bytearray(lineSize * min(band_lines, lines))
+        for band_start in range(0, lines, band_lines):
+            band_end = min(band_start + band_lines, lines)
+            for i in range(band_end - band_start):
+                src = (band_start + i) * bytesPerLine
+                band[i * lineSize:i * lineSize + bytesPerLine] = pixels[src:src + bytesPerLine]
+            stream.DATA(memoryview(band)[:(band_end - band_start) * lineSize])
+    if output is not None:
+        return output.getvalue()
+
+
+def validate(stream: FileReader, file_size: int) -> list[str]:
+    """
+    只读取文件头和数据头检查Bitmap文件的结构是否一致
+
+    参数：
+        - stream: `FileReader`
+        - file_size: 文件大小
+    返回值：
+        发现的问题列表，为空代表通过检查
+    """
+    header_size = serializer_size(BMPFileHeader) + serializer_size(BMPInfoHeader)
+    if file_size < header_size:
+        return [f'文件大小{file_size}小于文件头大小{header_size}']
+    _fileHeader = BMPFileHeader.parse(stream)
+    _infoHeader = BMPInfoHeader.parse(stream)
+    problems = []
+    if _fileHeader.bfType != b'BM':
+        problems.append(f'bfType={_fileHeader.bfType!r}不是BM')
+    if _fileHeader.bfSize != file_size:
+        problems.append(f'bfSize={_fileHeader.bfSize}与文件大小{file_size}不一致')
+    if not header_size <= _fileHeader.bfOffBits <= file_size:
+        problems.append(f'bfOffBits={_fileHeader.bfOffBits}超出范围[{header_size}, {file_size}]')
+        return problems
+    data_size = file_size - _fileHeader.bfOffBits
+    if _infoHeader.biCompression in (CompressionType.BI_RGB,
+                                     CompressionType.BI_BITFIELDS,
+                                     CompressionType.BI_ALPHABITFIELDS):
+        image_size = row_size(_infoHeader.biWidth, _infoHeader.biBitCount) * abs(_infoHeader.biHeight)
+        if image_size > data_size:
+            problems.append(f'图像数据需要{image_size}字节，但只剩下{data_size}字节')
+    elif _infoHeader.biSizeImage > data_size:
+        problems.append(f'biSizeImage={_infoHeader.biSizeImage}大于剩下的{data_size}字节')
+    return problems
@@ -0,0 +1,152 @@
+"""
+模块名：`Blob`
+
+文件中一段数据的轻量句柄，用于代替大块`DATA`的`bytes`，只在使用时读取。
+
+使用方式：
+    `from Blob import Blob`
+
+包含类：
+    - `Blob`: 数据句柄
+"""
+import weakref
+from itertools import zip_longest
+from typing import Iterator
+
+
+class Blob:
+    """
+    数据句柄，只记录来源文件`source`、偏移`offset`和长度`length`。
+
+    支持`len`、分块迭代、切片、`bytes`转换、哈希、`readinto`以及与`bytes`的比较，
+    所有读取都会重新打开来源文件，来源文件在句柄使用前不应被修改。
+    """
+    CHUNK_SIZE = 1 << 20
+    """
+    分块迭代的默认块大小
+    """
+    # 句柄不可哈希，以`id`为键记录存活的句柄
+    _live = weakref.WeakValueDictionary()
+
+    def __init__(self, source: str, offset: int, length: int):
+        self.source = source
+        self.offset = offset
+        self.length = length
+        Blob._live[id(self)] = self
+
+    @classmethod
+    def live_sources(cls) -> set:
+        """
+        所有存活的句柄引用的来源文件，`FileWriter`据此判断写入的文件是否需要经过临时文件
+        """
+        return {blob.source for blob in list(cls._live.values())}
+
+    def __reduce__(self):
+        return self.__class__, (self.source, self.offset, self.length)
+
+    def __len__(self):
+        return self.length
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        分块读取数据
+
+        参数：
+            - chunk_size: 块大小
+        返回值：
+            按顺序产生每块数据
+        """
+        remain = self.length
+        with open(self.source, 'rb') as f:
+            f.seek(self.offset)
+            while remain > 0:
+                chunk = f.read(min(chunk_size, remain))
+                if not chunk:
+                    break
+                remain -= len(chunk)
+                yield chunk
+
+    def __iter__(self) -> Iterator[bytes]:
+        """
+        分块迭代，注意与`bytes`不同，每次产生的是一块数据而不是一个字节
+        """
+        return self.chunks()
+
+    def readinto(self, buffer) -> int:
+        """
+        把数据读入调用者提供的缓冲区，最多读取`len(buffer)`个字节
+
+        参数：
+            - buffer: 可写的缓冲区，例如`bytearray`或`memoryview`
+        返回值：
+            读取的字节数
+        """
+        view = memoryview(buffer).cast('B')
+        view = view[:min(len(view), self.length)]
+        total = 0
+        with open(self.source, 'rb') as f:
+            f.seek(self.offset)
+            while total < len(view):
+                n = f.readinto(view[total:])
+                if not n:
+                    break
+                total += n
+        return total
+
+    def __bytes__(self):
+        buffer = bytearray(self.length)
+        n = self.readinto(buffer)
+        return bytes(buffer[:n]) if n < self.length else bytes(buffer)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step != 1:
+                # 非连续切片只能读取后再切片
+                return bytes(self)[key]
+            return Blob(self.source, self.offset + start, max(stop - start, 0))
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError('Blob索引超出范围')
+        return bytes(Blob(self.source, self.offset + key, 1))[0]
+
+    def hash(self, algorithm: str = 'sha256'):
+        """
+        分块计算数据的哈希
+
+        参数：
+            - algorithm: `hashlib`支持的算法名
+        返回值：
+            `hashlib`的哈希对象
+        """
+        import hashlib
+        h = hashlib.new(algorithm)
+        for chunk in self.chunks():
+            h.update(chunk)
+        return h
+
+    def __eq__(self, other):
+        if isinstance(other, Blob):
+            if (self.source, self.offset, self.length) == (other.source, other.offset, other.length):
+                return True
+            if self.length != other.length:
+                return False
+            # 来源文件被截断时读取到的数据会变少，不能只比较较短的部分
+            return all(a == b for a, b in zip_longest(self.chunks(), other.chunks()))
+        if isinstance(other, (bytes, bytearray, memoryview)):
+            other = memoryview(other).cast('B')
+            if self.length != len(other):
+                return False
+            pos = 0
+            for chunk in self.chunks():
+                if other[pos:pos + len(chunk)] != chunk:
+                    return False
+                pos += len(chunk)
+            return pos == self.length
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}{{source={self.source!r}, offset={self.offset}, length={self.length}}}'
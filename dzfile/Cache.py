@@ -0,0 +1,267 @@
+"""
+模块名：`Cache`
+
+`dzfile.parse`的磁盘解析结果缓存。
+
+使用方式：
+    `from dzfile.Cache import ParseCache`
+
+包含类：
+    - `ParseCache`: 解析结果缓存
+"""
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+import time
+import zlib
+from .DataType import *
+from .FileStream import DEFAULT_BLOB_THRESHOLD
+from .Serializer import Serializer, MetaSerializer
+
+
+def _rebuild_serializer(name: str, bases: tuple, annotations: dict):
+    """
+    根据名字、基类和注解重建动态模板
+    """
+    return MetaSerializer(name, bases, {
+        '__annotations__': annotations,
+        '__module__': __name__,
+        # 保留`<locals>`，使重建的模板可以再次被序列化
+        '__qualname__': f'{_rebuild_serializer.__qualname__}.<locals>.{name}',
+    })
+
+
+class _ResultPickler(pickle.Pickler):
+    """
+    可以序列化动态模板的`Pickler`
+
+    动态模板（函数内定义的`Serializer`）和`DATA`, `ARRAY`类型无法按引用序列化，
+    这里按名字、基类和注解序列化，同一个模板只会写入一次。动态模板中定义的方法不会被保留。
+    设置了`FACTORY`的动态模板仍然通过工厂重建。
+    """
+
+    def reducer_override(self, obj):
+        if (isinstance(obj, type) and issubclass(obj, Serializer) and '<locals>' in obj.__qualname__
+                and obj.__dict__.get('FACTORY') is None):
+            return _rebuild_serializer, (obj.__name__, obj.__bases__, dict(obj.__annotations__))
+        name = getattr(obj, '__name__', None)
+        if name == DATA.__name__ and hasattr(obj, 'n'):
+            return DATA, (obj.n,)
+        if name == ARRAY.__name__ and hasattr(obj, 'type'):
+            return ARRAY, (obj.type, obj.n)
+        return NotImplemented
+
+
+def _default_directory() -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'dzfile')
+
+
+class ParseCache:
+    """
+    解析结果缓存
+
+    解析结果以压缩的`pickle`保存在缓存目录中，以文件路径、大小、修改时间、格式和格式模块的`SCHEMA_VERSION`作为键。
+    缓存总大小超过`max_size`时按最近使用时间淘汰，写入使用临时文件加`os.replace`，可以在同一主机的多个进程间共享。
+    读取缓存会反序列化`pickle`，缓存目录必须属于当前用户并且其他用户不可写，否则抛出`PermissionError`。
+    本进程只记录自己写入的大小，超过`max_size`时才重新扫描目录，其他进程写入的条目在下一次扫描时计入。
+    """
+    SUFFIX = '.dzc'
+    """
+    缓存文件的后缀
+    """
+    STALE_TMP_SECONDS = 3600
+    """
+    超过该时间的临时文件视为写入进程崩溃后的残留，淘汰时删除
+    """
+
+    def __init__(self, directory: str = None, max_size: int = 256 << 20):
+        """
+        参数：
+            - directory: 缓存目录，默认为`$XDG_CACHE_HOME/dzfile`
+            - max_size: 缓存目录的最大字节数
+        """
+        self.directory = directory or _default_directory()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self._check_directory()
+        # 以更小的`max_size`打开已有的缓存目录时立即收缩
+        self._evict()
+
+    def _check_directory(self):
+        """
+        检查缓存目录不能被其他用户写入，避免加载其他用户放入的`pickle`
+        """
+        if not hasattr(os, 'getuid'):
+            return
+        stat = os.stat(self.directory)
+        if stat.st_uid != os.getuid():
+            raise PermissionError(f'缓存目录{self.directory}不属于当前用户')
+        if stat.st_mode & 0o022:
+            raise PermissionError(f'缓存目录{self.directory}可以被其他用户写入')
+
+    def _key(self, file_path: str, file_extension: str, stat: os.stat_result, blob_threshold: int) -> str:
+        """
+        计算缓存键
+        """
+        from . import load_format
+        module = load_format(file_extension) if file_extension else None
+        schema_version = getattr(module, 'SCHEMA_VERSION', 0)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns,
+               file_extension, schema_version, blob_threshold)
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def _load(self, entry_path: str):
+        """
+        读取缓存文件，不存在或损坏时抛出`KeyError`
+        """
+        try:
+            with open(entry_path, 'rb') as f:
+                data = f.read()
+            result = pickle.loads(zlib.decompress(data))
+        except FileNotFoundError:
+            raise KeyError(entry_path)
+        except Exception:
+            # 损坏的缓存直接删除
+            self._remove(entry_path)
+            raise KeyError(entry_path)
+        try:
+            # 更新修改时间作为最近使用时间
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return result
+
+    def _store(self, entry_path: str, result):
+        """
+        写入缓存文件，无法序列化时不写入
+        """
+        buffer = io.BytesIO()
+        try:
+            _ResultPickler(buffer, pickle.HIGHEST_PROTOCOL).dump(result)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        data = zlib.compress(buffer.getvalue(), 1)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            self._remove(tmp_path)
+            return
+        self.size += len(data)
+        if self.size > self.max_size:
+            self._evict()
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _entries(self) -> list:
+        """
+        所有缓存文件的`(路径, os.stat_result)`，其他进程可能同时删除文件
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(self.SUFFIX):
+                continue
+            try:
+                entries.append((entry.path, entry.stat()))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def _evict(self):
+        """
+        删除崩溃的写入进程留下的临时文件，并按最近使用时间淘汰缓存，直到总大小不超过`max_size`，只扫描一次目录
+        """
+        deadline = time.time() - self.STALE_TMP_SECONDS
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.endswith(self.SUFFIX):
+                    entries.append((entry.path, entry.stat()))
+                elif entry.name.endswith('.tmp') and entry.stat().st_mtime < deadline:
+                    self._remove(entry.path)
+            except FileNotFoundError:
+                continue
+        total_size = sum(stat.st_size for _, stat in entries)
+        if total_size > self.max_size:
+            entries.sort(key=lambda entry: entry[1].st_mtime_ns)
+            for path, stat in entries:
+                if total_size <= self.max_size:
+                    break
+                self._remove(path)
+                total_size -= stat.st_size
+        self.size = total_size
+
+    def parse(self, file_path: str, file_extension: str = None, blob_threshold: int = DEFAULT_BLOB_THRESHOLD):
+        """
+        与`dzfile.parse`相同，文件未修改时直接返回缓存的解析结果
+
+        参数：
+            - file_path: 要解析的文件路径，包含扩展名
+            - file_extension: 可以指定扩展名，大小写匹配
+            - blob_threshold: `DATA`超过该大小时解析为`Blob`句柄，`None`代表总是读取为`bytes`
+
+        返回值：
+            文件解析结果
+        """
+        from . import resolve_parse_handler, FileReader
+        file_extension, parse_handler = resolve_parse_handler(file_path, file_extension)
+        stream = FileReader(file_path, blob_threshold=blob_threshold)
+        try:
+            # 使用已经打开的文件计算键，避免解析期间文件被修改后以旧的键缓存新内容
+            stat = os.fstat(stream.file.fileno())
+            entry_path = os.path.join(
+                self.directory, self._key(file_path, file_extension, stat, blob_threshold) + self.SUFFIX)
+            try:
+                result = self._load(entry_path)
+                self.hits += 1
+                return result
+            except KeyError:
+                self.misses += 1
+            result = parse_handler(stream)
+        finally:
+            stream.close()
+        # 解析期间文件被修改时不写入缓存
+        try:
+            new_stat = os.stat(file_path)
+        except OSError:
+            return result
+        if (new_stat.st_ino, new_stat.st_size, new_stat.st_mtime_ns) != (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+            return result
+        self._store(entry_path, result)
+        return result
+
+    def clear(self):
+        """
+        清空缓存目录
+        """
+        for path, _ in self._entries():
+            self._remove(path)
+        self.size = 0
+
+    def stats(self) -> dict:
+        """
+        缓存统计信息
+
+        返回值：
+            包含本进程的命中次数`hits`、未命中次数`misses`，以及缓存目录中的条目数`entries`和总大小`size`
+        """
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'size': sum(stat.st_size for _, stat in entries),
+        }
@@ -7,6 +7,7 @@
     `from Common import *`
 """
 from .DataType import *
-from .FileStream import FileReader, FileWriter
-from .Serializer import Serializer, DefaultSerializer, arg_parse, arg_dump, serializer_size
+from .FileStream import FileReader, PositionalReader, BytesReader, FileWriter, DEFAULT_BLOB_THRESHOLD
+from .Blob import Blob
+from .Serializer import Serializer, DefaultSerializer, arg_parse, arg_aparse, arg_dump, serializer_size, is_fixed_size
 from .TimeType import Time64, Time32
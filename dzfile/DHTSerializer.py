@@ -1,5 +1,7 @@
 from .Common import *
 
+SCHEMA_VERSION = 1
+
 class DHTHeader(Serializer):
     __endian__: BIG_ENDIAN
     magic: DATA(2)
@@ -36,11 +38,45 @@ class DHTContent(Serializer):
     nodeID: DATA(20)
     reversed: DATA(4)
 
-def parse(stream: FileReader):
-    start_pos = stream.tell()
-    _header = DHTHeader.parse(stream)
+def template(_header: DHTHeader):
     class DHT(Serializer):
         header: DHTHeader
         contents: ARRAY(DHTContent, _header.numNode)
+    return DHT
+
+def parse(stream: FileReader):
+    start_pos = stream.tell()
+    _header = DHTHeader.parse(stream)
+    DHT = template(_header)
     stream.seek(start_pos)
-    return DHT.parse(stream)
\ No newline at end of file
+    return DHT.parse(stream)
+
+async def aparse(stream):
+    head = await stream.read(serializer_size(DHTHeader))
+    _header = DHTHeader.parse(BytesReader(head, stream.byteorder))
+    DHT = template(_header)
+    stream.unread(head)
+    return await DHT.aparse(stream)
+
+def parse_parallel(path: str, workers: int = None, executor=None):
+    stream = FileReader(path)
+    _header = DHTHeader.parse(stream)
+    stream.close()
+    DHT = template(_header)
+    return DHT.parse_parallel(path, 'contents', workers, executor)
+
+def validate(stream: FileReader, file_size: int) -> list[str]:
+    header_size = serializer_size(DHTHeader)
+    if file_size < header_size:
+        return [f'文件大小{file_size}小于文件头大小{header_size}']
+    _header = DHTHeader.parse(stream)
+    problems = []
+    if _header.magic != b'\xa1\xa2':
+        problems.append(f'magic={_header.magic!r}不是aria2的DHT文件')
+    contents_size = _header.numNode * serializer_size(DHTContent)
+    remain_size = file_size - header_size
+    if contents_size > remain_size:
+        problems.append(f'numNode={_header.numNode}需要{contents_size}字节，但只剩下{remain_size}字节')
+    elif contents_size < remain_size:
+        problems.append(f'numNode={_header.numNode}之后还有{remain_size - contents_size}字节多余数据')
+    return problems
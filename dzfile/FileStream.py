@@ -8,75 +8,114 @@
 
 包含类：
     - `FileReader`: 输入文件流
+    - `PositionalReader`: 基于`os.pread`的输入文件流，没有共享的文件指针，可以多线程读取同一文件，
+      没有`os.pread`的平台（例如Windows）上每个读取器使用自己的文件描述符
+    - `BytesReader`: 内存中的输入流
     - `FileWriter`: 输出文件流
 """
+import os
 from .DataType import *
+from .Blob import Blob
 from typing import Literal
 
+DEFAULT_BLOB_THRESHOLD = 16 << 20
+"""
+`DATA`超过该大小时返回`Blob`句柄而不是`bytes`
+"""
+
 
 class FileReader:
     """
     输入文件流
     """
 
-    def __init__(self, filename: str, byteorder: Literal['little', 'big'] = 'little'):
+    def __init__(self, filename: str, byteorder: Literal['little', 'big'] = 'little',
+                 blob_threshold: int = DEFAULT_BLOB_THRESHOLD):
+        """
+        参数：
+            - filename: 文件名
+            - byteorder: 端序
+            - blob_threshold: `DATA`超过该大小时返回`Blob`句柄，`None`代表总是读取为`bytes`
+        """
         assert byteorder in ('little', 'big'), "端序必须是'little'或者'big'"
+        self.filename = filename
         self.file = open(filename, 'rb')
         self.byteorder = byteorder
+        self.blob_threshold = blob_threshold
+
+    def _read(self, n: int = -1) -> bytes:
+        """
+        从当前位置读取n个字节，负数代表读取剩下的所有数据
+        """
+        return self.file.read(n)
+
+    def _size(self) -> int:
+        """
+        文件大小
+        """
+        return os.fstat(self.file.fileno()).st_size
 
     def BYTE(self) -> BYTE:
         """
         获取无符号一字节整数
         """
-        return int.from_bytes(self.file.read(1), self.byteorder)
+        return int.from_bytes(self._read(1), self.byteorder)
 
     def WORD(self) -> WORD:
         """
         获取无符号两字节整数
         """
-        return int.from_bytes(self.file.read(2), self.byteorder)
+        return int.from_bytes(self._read(2), self.byteorder)
 
     def DWORD(self) -> DWORD:
         """
         获取无符号四字节整数
         """
-        return int.from_bytes(self.file.read(4), self.byteorder)
+        return int.from_bytes(self._read(4), self.byteorder)
 
     def QWORD(self) -> QWORD:
         """
         获取无符号八字节整数
         """
-        return int.from_bytes(self.file.read(8), self.byteorder)
+        return int.from_bytes(self._read(8), self.byteorder)
 
     def CHAR(self) -> CHAR:
         """
         获取有符号一字节整数
         """
-        return int.from_bytes(self.file.read(1), self.byteorder, signed=True)
+        return int.from_bytes(self._read(1), self.byteorder, signed=True)
 
     def SHORT(self) -> SHORT:
         """
         获取有符号两字节整数
         """
-        return int.from_bytes(self.file.read(2), self.byteorder, signed=True)
+        return int.from_bytes(self._read(2), self.byteorder, signed=True)
 
     def LONG(self) -> LONG:
         """
         获取有符号四字节整数
         """
-        return int.from_bytes(self.file.read(4), self.byteorder, signed=True)
+        return int.from_bytes(self._read(4), self.byteorder, signed=True)
 
     def LLONG(self) -> LLONG:
         """
         获取有符号八字节整数
         """
-        return int.from_bytes(self.file.read(8), self.byteorder, signed=True)
+        return int.from_bytes(self._read(8), self.byteorder, signed=True)
 
     def DATA(self, n: int = 1) -> DATA:
         """
-        获取n个字节
-        """
-        return self.file.read(n)
+        获取n个字节，负数代表剩下的所有数据，超过`blob_threshold`时返回`Blob`句柄
+        """
+        if self.blob_threshold is not None and (n < 0 or n > self.blob_threshold):
+            pos = self.tell()
+            remain = max(self._size() - pos, 0)
+            size = remain if n < 0 else min(n, remain)
+            if size > self.blob_threshold:
+                self.seek(pos + size)
+                # 使用绝对路径，切换工作目录或者经过缓存传给其他进程后仍然可以读取
+                return Blob(os.path.abspath(self.filename), pos, size)
+        return self._read(n)
     
     def endian(self, byteorder: Literal['little', 'big']):
         """
@@ -94,6 +133,12 @@ class FileReader:
     def tell(self):
         return self.file.tell()
 
+    def at_eof(self) -> bool:
+        """
+        是否已经没有数据，与`AsyncReader.at_eof`一致
+        """
+        return not self.peek(1)
+
     def close(self):
         self.file.close()
 
@@ -101,14 +146,159 @@ class FileReader:
         self.close()
 
 
+class PositionalReader(FileReader):
+    """
+    基于`os.pread`的输入文件流
+
+    每个`PositionalReader`只维护自己的读取位置，所有读取都通过`os.pread`以显式偏移进行，
+    不依赖操作系统中共享的文件指针。通过`fork`可以得到共享同一文件描述符、但位置独立的读取器，
+    因此可以在多个线程中同时解析同一个文件。
+    没有`os.pread`的平台（例如Windows）上`fork`会重新打开文件，每个读取器通过自己的文件描述符`lseek`后读取。
+    序列化（`pickle`）时只保存文件名、位置和端序，反序列化时会重新打开文件，可以传递给进程池。
+    """
+
+    def __init__(self, filename: str, byteorder: Literal['little', 'big'] = 'little',
+                 blob_threshold: int = DEFAULT_BLOB_THRESHOLD):
+        assert byteorder in ('little', 'big'), "端序必须是'little'或者'big'"
+        self.filename = filename
+        self.fd = os.open(filename, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        self.owner = True   # 只有打开文件描述符的读取器负责关闭它
+        self.pos = 0
+        self.byteorder = byteorder
+        self.blob_threshold = blob_threshold
+
+    def _pread(self, n: int, _offset: int) -> bytes:
+        """
+        从`_offset`读取最多n个字节，不改变读取位置
+        """
+        if hasattr(os, 'pread'):
+            return os.pread(self.fd, n, _offset)
+        # 文件描述符不与其他读取器共享，可以直接移动文件指针
+        os.lseek(self.fd, _offset, os.SEEK_SET)
+        return os.read(self.fd, n)
+
+    def _read(self, n: int = -1) -> bytes:
+        if n < 0:
+            n = max(self._size() - self.pos, 0)
+        data = self._pread(n, self.pos)
+        self.pos += len(data)
+        return data
+
+    def _size(self) -> int:
+        return os.fstat(self.fd).st_size
+
+    def fork(self, _offset: int = None) -> 'PositionalReader':
+        """
+        创建一个共享文件描述符的新读取器，新读取器拥有独立的读取位置
+
+        参数：
+            - _offset: 新读取器的起始位置，默认为当前位置
+        返回值：
+            新的`PositionalReader`
+        """
+        if not hasattr(os, 'pread'):
+            # 没有`os.pread`时不能共享文件指针，重新打开文件
+            reader = PositionalReader(self.filename, self.byteorder, self.blob_threshold)
+            reader.pos = self.pos if _offset is None else _offset
+            return reader
+        reader = object.__new__(PositionalReader)
+        reader.filename = self.filename
+        reader.fd = self.fd
+        reader.owner = False
+        reader.pos = self.pos if _offset is None else _offset
+        reader.byteorder = self.byteorder
+        reader.blob_threshold = self.blob_threshold
+        return reader
+
+    def seek(self, _offset: int):
+        self.pos = _offset
+
+    def peek(self, __size: int = 0):
+        return self._pread(max(__size, 1), self.pos)
+
+    def tell(self):
+        return self.pos
+
+    def close(self):
+        if self.owner and self.fd is not None:
+            os.close(self.fd)
+        self.fd = None
+
+    def __getstate__(self):
+        return {'filename': self.filename, 'pos': self.pos, 'byteorder': self.byteorder,
+                'blob_threshold': self.blob_threshold}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'], state['byteorder'], state['blob_threshold'])
+        self.pos = state['pos']
+
+
+class BytesReader(FileReader):
+    """
+    内存中的输入流，用于从已经读取的数据中解析，`DATA`总是返回`bytes`
+    """
+
+    def __init__(self, data: bytes, byteorder: Literal['little', 'big'] = 'little'):
+        assert byteorder in ('little', 'big'), "端序必须是'little'或者'big'"
+        self.filename = None
+        self.data = data
+        self.pos = 0
+        self.byteorder = byteorder
+        self.blob_threshold = None
+
+    def _read(self, n: int = -1) -> bytes:
+        end = len(self.data) if n < 0 else self.pos + n
+        data = bytes(self.data[self.pos:end])
+        self.pos += len(data)
+        return data
+
+    def _size(self) -> int:
+        return len(self.data)
+
+    def seek(self, _offset: int):
+        self.pos = _offset
+
+    def peek(self, __size: int = 0):
+        return bytes(self.data[self.pos:self.pos + max(__size, 1)])
+
+    def tell(self):
+        return self.pos
+
+    def close(self):
+        pass
+
+
 class FileWriter:
     """
     输出文件流
     """
 
     def __init__(self, filename: str, byteorder: Literal['little', 'big'] = 'little'):
+        """
+        参数：
+            - filename: 文件名，也可以是已经打开的二进制文件对象，例如`io.BytesIO`，
+              传入的文件对象不会被`close`关闭。
+              文件已经被存活的`Blob`引用时先写入同目录下的临时文件，`close`时再替换原文件，
+              因此可以把从该文件解析出的对象（包括其中的`Blob`）写回原文件；
+              没有`close`就被回收时丢弃临时文件，原文件保持不变
+            - byteorder: 端序
+        """
         assert byteorder in ('little', 'big'), "端序必须是'little'或者'big'"
-        self.file = open(filename, 'wb')
+        # 只有自己打开的文件才负责关闭
+        self.owner = not hasattr(filename, 'write')
+        self.target = None
+        if not self.owner:
+            self.file = filename
+        elif _is_blob_source(filename):
+            import tempfile
+            target = os.path.realpath(filename)
+            fd, self.tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(target), prefix=f'.{os.path.basename(target)}.', suffix='.tmp')
+            self.file = os.fdopen(fd, 'wb')
+            self.target = target
+            os.chmod(self.tmp_path, os.stat(target).st_mode & 0o7777)
+        else:
+            self.file = open(filename, 'wb')
         self.byteorder = byteorder
 
     def BYTE(self, data: int) -> BYTE:
@@ -161,10 +351,61 @@ class FileWriter:
 
     def DATA(self, data: bytes) -> DATA:
         """
-        写入数据`data`
-        """
+        写入数据`data`，`data`也可以是`Blob`句柄，
+        此时优先通过`os.copy_file_range`或`os.sendfile`直接从来源文件复制，不经过Python内存
+        """
+        if isinstance(data, Blob):
+            written = self._copy_blob(data)
+            for chunk in data[written:].chunks():
+                self.file.write(chunk)
+                written += len(chunk)
+            if written < data.length:
+                raise OSError(f'{data}的来源文件数据不足，只写入了{written}字节')
+            return
         self.file.write(data)
 
+    def _copy_blob(self, blob: Blob) -> int:
+        """
+        在内核中把`blob`复制到当前位置，不支持时尽可能少复制
+
+        返回值：
+            已经复制的字节数
+        """
+        try:
+            out_fd = self.file.fileno()
+        except OSError:
+            return 0
+        self.file.flush()
+        out_pos = self.file.tell()
+        copied = 0
+        with open(blob.source, 'rb') as src:
+            in_fd = src.fileno()
+            if os.path.samestat(os.fstat(in_fd), os.fstat(out_fd)):
+                raise ValueError(f'不能把{blob}写入它的来源文件')
+            if hasattr(os, 'copy_file_range'):
+                try:
+                    while copied < blob.length:
+                        n = os.copy_file_range(in_fd, out_fd, blob.length - copied,
+                                               blob.offset + copied, out_pos + copied)
+                        if n == 0:
+                            break
+                        copied += n
+                except OSError:
+                    # 跨文件系统或文件系统不支持时退回`sendfile`
+                    pass
+            if copied < blob.length and hasattr(os, 'sendfile'):
+                try:
+                    os.lseek(out_fd, out_pos + copied, os.SEEK_SET)
+                    while copied < blob.length:
+                        n = os.sendfile(out_fd, in_fd, blob.offset + copied, blob.length - copied)
+                        if n == 0:
+                            break
+                        copied += n
+                except OSError:
+                    pass
+        self.file.seek(out_pos + copied)
+        return copied
+
     def endian(self, byteorder: Literal['little', 'big']):
         """
         修改文件流写入的端序
@@ -176,7 +417,38 @@ class FileWriter:
         self.file.seek(_offset)
 
     def close(self):
-        self.file.close()
+        if self.owner and not self.file.closed:
+            self.file.close()
+            if self.target is not None:
+                # 写入完成后替换原文件
+                os.replace(self.tmp_path, self.target)
+                self.target = None
 
     def __del__(self):
+        if self.target is not None:
+            # 没有显式`close`的写入可能不完整，丢弃临时文件
+            self.file.close()
+            try:
+                os.remove(self.tmp_path)
+            except OSError:
+                pass
+            self.target = None
+            return
         self.close()
+
+
+def _is_blob_source(filename: str) -> bool:
+    """
+    文件是否是某个存活的`Blob`的来源文件
+    """
+    try:
+        target = os.stat(filename)
+    except OSError:
+        return False
+    for source in Blob.live_sources():
+        try:
+            if os.path.samestat(os.stat(source), target):
+                return True
+        except OSError:
+            continue
+    return False
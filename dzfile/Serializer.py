@@ -13,11 +13,15 @@
 包含方法：
     - `arg_parse`: 参数解析
     - `arg_dump`: 参数写入
+    - `arg_aparse`: 参数异步解析
     - `serializer_size`: 获取序列器大小
+    - `is_fixed_size`: 判断序列器大小是否固定
 """
+import copyreg
 import logging
+import os
 from .DataType import *
-from .FileStream import FileReader, FileWriter
+from .FileStream import FileReader, FileWriter, PositionalReader, BytesReader
 
 
 check_logger = logging.getLogger('check_logger')
@@ -48,7 +52,7 @@ def arg_parse(arg_type, stream: FileReader):
         # 这里需要考虑array_n<0的情况，此时需要死循环直到stream无输出
         # 循环获取数组元素
         if array_n < 0:
-            while not stream.peek(1):
+            while not stream.at_eof():
                 arg_result.append(arg_parse(array_type, stream))
         else:
             for _ in range(array_n):
@@ -82,6 +86,78 @@ def arg_parse(arg_type, stream: FileReader):
     return arg_result
 
 
+SIGNED_TYPE_NAMES = (
+    CHAR.__name__,
+    SHORT.__name__,
+    LONG.__name__,
+    LLONG.__name__,
+)
+"""
+有符号基本类型的名字
+"""
+
+
+async def _decode(arg_type, data: bytes, byteorder: str):
+    """
+    从已经读取的数据中解析参数，数据较小时直接在事件循环中解析，较大时在线程池中解析
+    """
+    from .AsyncStream import INLINE_DECODE_SIZE, get_default_executor
+    if len(data) <= INLINE_DECODE_SIZE:
+        return arg_parse(arg_type, BytesReader(data, byteorder))
+    import asyncio
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_default_executor(), arg_parse, arg_type, BytesReader(data, byteorder))
+
+
+async def arg_aparse(arg_type, stream):
+    """
+    `arg_parse`的异步版本，给定参数类型，从`AsyncReader`中解析数据。如果类型无法解析那么抛出异常`AttributeError`。
+
+    参数：
+        - arg_type: 参数类型，例如`int`
+        - stream: `AsyncReader`
+
+    返回值：
+        从`AsyncReader`中提取到的参数，然后返回结果
+    """
+    arg_result = None
+    # 如果是自定义的`Serializer`类型必然有`aparse`方法
+    if hasattr(arg_type, 'aparse'):
+        arg_result = await getattr(arg_type, 'aparse')(stream)
+    elif arg_type.__name__ == ARRAY.__name__:
+        array_type = getattr(arg_type, 'type')   # 数组的元素类型
+        array_n = getattr(arg_type, 'n')      # 数组的元素个数
+        if array_n < 0:
+            # 循环获取数组元素直到stream无输出
+            arg_result = []
+            while not await stream.at_eof():
+                arg_result.append(await arg_aparse(array_type, stream))
+        elif is_fixed_size(array_type):
+            # 定长元素一次性读取后解码
+            data = await stream.read(serializer_size(array_type) * array_n)
+            arg_result = await _decode(arg_type, data, stream.byteorder)
+        else:
+            arg_result = []
+            for _ in range(array_n):
+                arg_result.append(await arg_aparse(array_type, stream))
+    elif arg_type.__name__ == DATA.__name__:
+        data_n = getattr(arg_type, 'n')       # 数据的个数
+        # 如果`DATA`的数据个数小于零，那么读取剩下的所有数据
+        if data_n < 0:
+            data_n = -1
+        arg_result = await stream.DATA(data_n)
+    # 基本类型的处理
+    elif arg_type.__name__ in BASIC_TYPE_SIZE:
+        data = await stream.read(BASIC_TYPE_SIZE[arg_type.__name__])
+        arg_result = int.from_bytes(data, stream.byteorder,
+                                    signed=arg_type.__name__ in SIGNED_TYPE_NAMES)
+    else:
+        # 对于未知类型抛出异常
+        raise AttributeError(f'未知类型：{arg_type}')
+    return arg_result
+
+
 def arg_dump(arg_value, arg_type, stream: FileWriter):
     """
     给定参数和参数类型，往`FileWriter`中写入数据。如果类型无法写入那么抛出异常`AttributeError`。
@@ -195,6 +271,11 @@ class Serializer(metaclass=MetaSerializer):
     """
     Serializer中可能出现的占位符
     """
+    FACTORY = None
+    """
+    动态模板的工厂`(factory, args)`，`factory(*args)`会返回同一个模板。
+    设置后动态模板可以被`pickle`，例如传给`ProcessPoolExecutor`
+    """
 
     @classmethod
     def parse(cls, stream: FileReader):
@@ -252,6 +333,100 @@ class Serializer(metaclass=MetaSerializer):
         # 修改回原始字节序
         stream.endian(old_byteorder)
 
+    @classmethod
+    async def aparse(cls, stream):
+        """
+        `parse`的异步版本，根据注解内容从`AsyncReader`解析文件格式。
+        较小的定长模板一次性读取后在事件循环中解码，其余按字段解析，较大的定长数组在线程池中解码。
+
+        参数：
+            - cls: 模板
+            - stream: `AsyncReader`
+        返回值：
+            文件解析结果
+        """
+        if is_fixed_size(cls):
+            from .AsyncStream import INLINE_DECODE_SIZE
+            size = serializer_size(cls)
+            if size <= INLINE_DECODE_SIZE:
+                data = await stream.read(size)
+                return cls.parse(BytesReader(data, stream.byteorder))
+        # 记录之前的字节序，因为可能会被修改
+        old_byteorder = stream.byteorder
+        obj = cls()
+        for attr_name, attr_type in cls.__annotations__.items():
+            # 动态调整端序
+            if attr_name == '__endian__':
+                if attr_type == BIG_ENDIAN:
+                    stream.endian('big')
+                elif attr_type == LITTLE_ENDIAN:
+                    stream.endian('little')
+                continue
+            attr_value = await arg_aparse(attr_type, stream)
+            setattr(obj, attr_name, attr_value)
+        # 修改回原始字节序
+        stream.endian(old_byteorder)
+        return obj
+
+    @classmethod
+    def parse_parallel(cls, path: str, field: str, workers: int = None, executor=None):
+        """
+        并行解析文件，把定长元素的`ARRAY`字段`field`按`serializer_size`切分成若干段，
+        并发解析后按顺序拼接，其余字段仍然顺序解析。
+
+        参数：
+            - cls: 模板
+            - path: 文件路径
+            - field: 需要并行解析的字段名，必须是元素大小固定、个数非负的`ARRAY`
+            - workers: 切分的段数，默认为`os.cpu_count()`
+            - executor: 执行并行解析的`Executor`，为`None`时顺序解析。
+              解析是纯Python代码，受GIL限制，线程池只能重叠I/O，不能利用多核，通常比顺序解析更慢；
+              需要多核加速时传入`ProcessPoolExecutor`，此时元素类型必须可以被`pickle`
+              （模块级的模板，或者设置了`FACTORY`的动态模板）
+        返回值：
+            文件解析结果
+        """
+        field_type = cls.__annotations__.get(field)
+        if field_type is None or field_type.__name__ != ARRAY.__name__:
+            raise AttributeError(f'{cls.__name__}.{field}不是`ARRAY`字段')
+        array_type = getattr(field_type, 'type')
+        array_n = getattr(field_type, 'n')
+        if array_n < 0 or not is_fixed_size(array_type):
+            raise AttributeError(f'{cls.__name__}.{field}的元素大小或个数不固定，无法切分')
+        if executor is None:
+            # 没有`Executor`时并发没有收益，直接顺序解析
+            stream = FileReader(path)
+            obj = cls.parse(stream)
+            stream.close()
+            return obj
+        workers = workers or os.cpu_count() or 1
+        stride = serializer_size(array_type)
+        stream = PositionalReader(path)
+        obj = cls()
+        for attr_name, attr_type in cls.__annotations__.items():
+            # 动态调整端序
+            if attr_name == '__endian__':
+                stream.endian(attr_type)
+                continue
+            if attr_name != field:
+                setattr(obj, attr_name, arg_parse(attr_type, stream))
+                continue
+            # 按元素个数均匀切分
+            start = stream.tell()
+            step = -(-array_n // workers) if array_n else 1
+            offsets = range(0, array_n, step)
+            readers = [stream.fork(start + i * stride) for i in offsets]
+            counts = [min(step, array_n - i) for i in offsets]
+            chunks = executor.map(_parse_range, readers, counts,
+                                  [array_type] * len(readers))
+            attr_value = []
+            for chunk in chunks:
+                attr_value.extend(chunk)
+            setattr(obj, attr_name, attr_value)
+            stream.seek(start + stride * array_n)
+        stream.close()
+        return obj
+
     def check(self) -> bool:
         """
         检查函数，用于实现自检查
@@ -272,6 +447,19 @@ class Serializer(metaclass=MetaSerializer):
         return repr_str
 
 
+def _reduce_serializer_class(cls):
+    """
+    `pickle`模板类时使用，设置了`FACTORY`的动态模板通过工厂重建，其余按引用序列化
+    """
+    factory = cls.__dict__.get('FACTORY')
+    if factory is not None:
+        return factory
+    return cls.__qualname__
+
+
+copyreg.pickle(MetaSerializer, _reduce_serializer_class)
+
+
 def serializer_size(cls):
     """
     根据`class`注解计算该模板需要解析的数据大小。
@@ -299,11 +487,45 @@ def serializer_size(cls):
         # 忽略无注解的解析器
         return 0
     total_size = 0
-    for attr_type in cls.__annotations__.values():
+    for attr_name, attr_type in cls.__annotations__.items():
+        # 端序注解不占用大小
+        if attr_name == '__endian__':
+            continue
         total_size += serializer_size(attr_type)
     return total_size
 
 
+def is_fixed_size(cls) -> bool:
+    """
+    判断模板需要解析的数据大小是否固定，即注解中不存在`DATA(-1)`, `ARRAY(type, -1)`等可变大小类型。
+
+    参数：
+        - cls: `Serializer`模板类或数据类型
+    返回值：
+        大小是否固定
+    """
+    if cls.__name__ in BASIC_TYPE_SIZE:
+        return True
+    elif cls.__name__ == DATA.__name__:
+        return getattr(cls, 'n') >= 0
+    elif cls.__name__ == ARRAY.__name__:
+        return getattr(cls, 'n') >= 0 and is_fixed_size(getattr(cls, 'type'))
+    elif not hasattr(cls, '__annotations__'):
+        return True
+    return all(is_fixed_size(attr_type)
+               for attr_name, attr_type in cls.__annotations__.items()
+               if attr_name != '__endian__')
+
+
+def _parse_range(stream: PositionalReader, array_n: int, array_type):
+    """
+    `Serializer.parse_parallel`的工作函数，从`stream`的当前位置解析`array_n`个`array_type`
+    """
+    arg_result = [arg_parse(array_type, stream) for _ in range(array_n)]
+    stream.close()
+    return arg_result
+
+
 class DefaultSerializer(Serializer):
     """
     默认的`Parser`类
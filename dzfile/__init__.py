@@ -6,13 +6,64 @@
 作者：qingsiduzou
 """
 from .Common import *
-from typing import Callable, Any
+from typing import Callable, Any, Iterable, Iterator, NamedTuple
+import importlib
+import os
+import threading
 
 handler_type = Callable[[FileReader], Any]
 parse_handlers: dict[str, handler_type] = {}
 """
 一组解析函数的回调处理器，用于根据文件的扩展名调用不同的解析函数来解析文件内容。
 """
+format_modules: dict[str, str] = {
+    'BMP': '.BMPSerializer',
+    'ARIA2DHT': '.DHTSerializer',
+}
+"""
+扩展名对应的格式模块路径，模块在第一次使用时才会被导入，模块需要提供`parse`函数。
+以`.`开头的路径相对于`dzfile`包。
+"""
+magic_formats: dict[bytes, str] = {
+    b'BM': 'BMP',
+    b'\xa1\xa2\x02': 'ARIA2DHT',
+}
+"""
+文件开头的魔数对应的扩展名，在扩展名无法匹配时用于识别文件格式。
+"""
+ENTRY_POINT_GROUP = 'dzfile.formats'
+"""
+第三方格式注册使用的entry point组名，名称为扩展名，值为格式模块路径。
+格式模块可以提供`MAGIC`（`bytes`或`bytes`的元组）声明魔数，第一次通过魔数识别格式时读取
+"""
+_entry_points_loaded = False
+_entry_point_formats: list[str] = []
+"""
+通过entry point注册、还没有读取`MAGIC`的扩展名
+"""
+_registry_lock = threading.RLock()
+"""
+保护`format_modules`、`magic_formats`和entry point的读取，`validate`会在多个线程中识别格式
+"""
+
+
+class ValidateResult(NamedTuple):
+    """
+    `validate`对单个文件的检查结果
+    """
+    path: str
+    """文件路径"""
+    format: str
+    """识别出的扩展名，未知格式为`None`"""
+    problems: list[str]
+    """发现的问题列表，未知格式或者格式模块没有`validate`时没有检查，为`None`"""
+
+    @property
+    def ok(self) -> bool:
+        """是否通过检查，没有检查时为`None`"""
+        if self.problems is None:
+            return None
+        return not self.problems
 
 
 def register_parse_handler(file_extension: str, parse_handler: handler_type):
@@ -30,32 +81,302 @@ def register_parse_handler(file_extension: str, parse_handler: handler_type):
     parse_handlers[file_extension.upper()] = parse_handler
 
 
-def parse(file_path: str, file_extension: str = None):
+def register_format(file_extension: str, module_path: str, magic: bytes = None):
     """
-    根据文件的扩展名调用不同的解析函数来解析这个文件，后缀名是大小写匹配的
+    注册格式模块，模块会在第一次解析该扩展名的文件时才被导入，后缀名总会是大小写匹配。
 
     参数：
-        - file_path: 要解析的文件路径，包含扩展名
-        - file_extension: 可以指定扩展名，大小写匹配
+        - file_extension: 要注册的文件扩展名
+        - module_path: 格式模块路径，模块需要提供`parse`函数，以`.`开头的路径相对于`dzfile`包
+        - magic: 可选的文件开头魔数，扩展名无法匹配时通过魔数识别格式
 
     返回值：
         无
     """
+    file_extension = file_extension.upper()
+    with _registry_lock:
+        format_modules[file_extension] = module_path
+        if magic is not None:
+            magic_formats[magic] = file_extension
+
+
+def _load_entry_points():
+    """
+    读取`ENTRY_POINT_GROUP`中第三方注册的格式模块，只会读取一次，已经注册的扩展名不会被覆盖
+    """
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    with _registry_lock:
+        if _entry_points_loaded:
+            return
+        from importlib.metadata import entry_points
+        try:
+            eps = entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:
+            # Python 3.9的`entry_points`不支持参数
+            eps = entry_points().get(ENTRY_POINT_GROUP, ())
+        for ep in eps:
+            file_extension = ep.name.upper()
+            if file_extension not in format_modules:
+                format_modules[file_extension] = ep.value
+                _entry_point_formats.append(file_extension)
+        # 注册完成后才标记为已读取，其他线程不会看到不完整的`format_modules`
+        _entry_points_loaded = True
+
+
+def _load_entry_point_magics():
+    """
+    导入通过entry point注册的格式模块，把其中的`MAGIC`加入`magic_formats`，只会读取一次
+    """
+    _load_entry_points()
+    if not _entry_point_formats:
+        return
+    with _registry_lock:
+        while _entry_point_formats:
+            file_extension = _entry_point_formats[-1]
+            try:
+                module = load_format(file_extension)
+            except Exception:
+                # 无法导入的第三方格式不参与魔数识别
+                module = None
+            magics = getattr(module, 'MAGIC', None)
+            if isinstance(magics, bytes):
+                magics = (magics,)
+            for magic in magics or ():
+                magic_formats.setdefault(magic, file_extension)
+            # 读取`MAGIC`后才移除，其他线程等待锁时不会漏掉这个格式
+            _entry_point_formats.pop()
+
+
+def load_format(file_extension: str):
+    """
+    导入扩展名对应的格式模块，后缀名是大小写匹配的
+
+    参数：
+        - file_extension: 文件扩展名
+
+    返回值：
+        格式模块，没有对应的格式模块时返回`None`
+    """
+    file_extension = file_extension.upper()
+    if file_extension not in format_modules:
+        _load_entry_points()
+    module_path = format_modules.get(file_extension)
+    if module_path is None:
+        return None
+    return importlib.import_module(module_path, __name__)
+
+
+def get_parse_handler(file_extension: str):
+    """
+    获取扩展名对应的解析函数，必要时导入格式模块，后缀名是大小写匹配的
+
+    参数：
+        - file_extension: 文件扩展名
+
+    返回值：
+        解析函数，没有对应的解析函数时返回`None`
+    """
+    file_extension = file_extension.upper()
+    parse_handler = parse_handlers.get(file_extension)
+    if parse_handler is None:
+        module = load_format(file_extension)
+        if module is None:
+            return None
+        parse_handler = module.parse
+        parse_handlers[file_extension] = parse_handler
+    return parse_handler
+
+
+def _is_plausible(file_path: str, file_extension: str) -> bool:
+    """
+    用格式模块的`validate`检查文件头是否合理，没有`validate`的格式只依赖魔数
+    """
+    validate_handler = getattr(load_format(file_extension), 'validate', None)
+    if validate_handler is None:
+        return True
+    stream = FileReader(file_path, blob_threshold=None)
+    try:
+        return not validate_handler(stream, os.fstat(stream.file.fileno()).st_size)
+    except Exception:
+        return False
+    finally:
+        stream.close()
+
+
+def sniff_format(file_path: str, check: bool = True):
+    """
+    根据文件开头的魔数识别文件格式
+
+    参数：
+        - file_path: 文件路径
+        - check: 是否要求格式模块的`validate`通过，避免较短的魔数（例如`BM`）误判
+
+    返回值：
+        识别出的扩展名，无法识别时返回`None`
+    """
+    _load_entry_point_magics()
+    with _registry_lock:
+        magics = list(magic_formats.items())
+    if not magics:
+        return None
+    with open(file_path, 'rb') as f:
+        head = f.read(max(len(magic) for magic, _ in magics))
+    # 优先匹配更长的魔数
+    for magic, file_extension in sorted(magics, key=lambda item: len(item[0]), reverse=True):
+        if head.startswith(magic):
+            if not check or _is_plausible(file_path, file_extension):
+                return file_extension
+    return None
+
+
+def resolve_parse_handler(file_path: str, file_extension: str = None):
+    """
+    获取文件对应的扩展名和解析函数，扩展名无法匹配时尝试通过魔数识别，都无法识别时使用`DefaultSerializer`
+
+    参数：
+        - file_path: 文件路径，包含扩展名
+        - file_extension: 可以指定扩展名，大小写匹配
+
+    返回值：
+        `(扩展名, 解析函数)`，使用`DefaultSerializer`时扩展名为`None`
+    """
     if file_extension is None:
         # 获取文件扩展名
         file_extension = file_path.rsplit('.', 1)[-1]
-    # 获取对应的解析函数回调处理器
-    parse_handler = parse_handlers.get(
-        file_extension.upper(), DefaultSerializer.parse)
-    stream = FileReader(file_path)
+    # 获取对应的解析函数回调处理器，扩展名无法匹配时尝试通过魔数识别
+    parse_handler = get_parse_handler(file_extension)
+    if parse_handler is None:
+        file_extension = sniff_format(file_path)
+        if file_extension is not None:
+            parse_handler = get_parse_handler(file_extension)
+    if parse_handler is None:
+        return None, DefaultSerializer.parse
+    return file_extension.upper(), parse_handler
+
+
+def parse(file_path: str, file_extension: str = None, blob_threshold: int = DEFAULT_BLOB_THRESHOLD):
+    """
+    根据文件的扩展名调用不同的解析函数来解析这个文件，后缀名是大小写匹配的
+
+    参数：
+        - file_path: 要解析的文件路径，包含扩展名
+        - file_extension: 可以指定扩展名，大小写匹配
+        - blob_threshold: `DATA`超过该大小时解析为`Blob`句柄，`None`代表总是读取为`bytes`
+
+    返回值：
+        无
+    """
+    _, parse_handler = resolve_parse_handler(file_path, file_extension)
+    stream = FileReader(file_path, blob_threshold=blob_threshold)
     # 调用解析函数的回调处理器解析文件内容
     parse_result = parse_handler(stream)
     stream.close()
     return parse_result
 
 
-# 初始化扩展序列器
-from . import BMPSerializer
-register_parse_handler('BMP', BMPSerializer.parse)
-from . import DHTSerializer
-register_parse_handler('ARIA2DHT', DHTSerializer.parse)
+async def aparse(file_path: str, file_extension: str = None, blob_threshold: int = DEFAULT_BLOB_THRESHOLD,
+                 executor=None):
+    """
+    `parse`的异步版本，阻塞的文件读取和较大数据的解码在线程池中执行，不会阻塞事件循环。
+    格式模块需要提供`aparse(stream)`协程函数，没有提供时整个`parse`在线程池中执行。
+
+    参数：
+        - file_path: 要解析的文件路径，包含扩展名
+        - file_extension: 可以指定扩展名，大小写匹配
+        - blob_threshold: `DATA`超过该大小时解析为`Blob`句柄，`None`代表总是读取为`bytes`
+        - executor: 执行阻塞操作的`Executor`，默认为`AsyncStream.get_default_executor()`
+
+    返回值：
+        文件解析结果
+    """
+    import asyncio
+    from .AsyncStream import AsyncFileReader, get_default_executor
+    executor = executor or get_default_executor()
+    loop = asyncio.get_running_loop()
+    # 识别格式可能需要读取魔数和导入模块
+    file_extension, parse_handler = await loop.run_in_executor(
+        executor, resolve_parse_handler, file_path, file_extension)
+    if file_extension is None:
+        aparse_handler = DefaultSerializer.aparse
+    else:
+        module = load_format(file_extension)
+        aparse_handler = getattr(module, 'aparse', None)
+        # 通过`register_parse_handler`覆盖的解析函数没有异步版本
+        if aparse_handler is not None and parse_handler is not getattr(module, 'parse', None):
+            aparse_handler = None
+    if aparse_handler is None:
+        return await loop.run_in_executor(executor, parse, file_path, file_extension, blob_threshold)
+    stream = AsyncFileReader(file_path, blob_threshold=blob_threshold, executor=executor)
+    try:
+        return await aparse_handler(stream)
+    finally:
+        await stream.close()
+
+
+def _validate_file(file_path: str, file_extension: str = None) -> ValidateResult:
+    """
+    `validate`的工作函数，检查单个文件
+    """
+    file_format = None   # 只有识别出格式模块后才记录扩展名
+    try:
+        if file_extension is None:
+            file_extension = file_path.rsplit('.', 1)[-1]
+        module = load_format(file_extension)
+        if module is None:
+            # 检查时不要求通过`validate`，否则损坏的文件会被当作未知格式
+            file_extension = sniff_format(file_path, check=False)
+            module = load_format(file_extension) if file_extension else None
+        if module is None:
+            # 未知格式没有检查，不能当作通过
+            return ValidateResult(file_path, None, None)
+        file_format = file_extension.upper()
+        validate_handler = getattr(module, 'validate', None)
+        if validate_handler is None:
+            # 没有检查函数的格式不做检查
+            return ValidateResult(file_path, file_format, None)
+        file_size = os.stat(file_path).st_size
+        stream = FileReader(file_path)
+        try:
+            problems = validate_handler(stream, file_size)
+        finally:
+            stream.close()
+        return ValidateResult(file_path, file_format, problems)
+    except Exception as e:
+        # 单个文件的错误不能中断整个检查
+        return ValidateResult(file_path, file_format, [f'{type(e).__name__}: {e}'])
+
+
+def validate(paths: Iterable[str], file_extension: str = None, workers: int = None) -> Iterator[ValidateResult]:
+    """
+    只根据文件头和`os.stat`检查文件结构是否一致，不做完整解析。
+    格式模块需要提供`validate(stream, file_size)`函数，返回发现的问题列表，没有检查函数的格式不做检查。
+
+    参数：
+        - paths: 要检查的文件路径
+        - file_extension: 可以指定扩展名，大小写匹配
+        - workers: 线程池的大小，默认为`os.cpu_count()`
+
+    返回值：
+        按`paths`的顺序逐个产生`ValidateResult`
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(workers) as executor:
+        # 限制提交的任务数，避免一次性提交整个语料库
+        pending = deque()
+        for file_path in paths:
+            pending.append(executor.submit(_validate_file, file_path, file_extension))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def __getattr__(name: str):
+    # 按需导入内置的格式模块，例如`dzfile.BMPSerializer`
+    if f'.{name}' in format_modules.values():
+        return importlib.import_module(f'.{name}', __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
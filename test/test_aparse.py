@@ -0,0 +1,73 @@
+import asyncio
+import os
+
+import pytest
+
+import dzfile
+from dzfile import BMPSerializer, DHTSerializer, FileReader, BytesReader, Serializer
+from dzfile.AsyncStream import AsyncReader, AsyncFileReader, AsyncStreamReader
+from dzfile.DataType import ARRAY, BYTE, WORD
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.mark.parametrize('name', ['30755992.bmp', 'dht.dat', 'time32_t', 'time64_t'])
+def test_aparse_matches_parse(name):
+    path = os.path.join(TEST_DIR, name)
+    assert repr(asyncio.run(dzfile.aparse(path))) == repr(dzfile.parse(path))
+
+
+@pytest.mark.parametrize('name, module', [('30755992.bmp', BMPSerializer), ('dht.dat', DHTSerializer)])
+def test_aparse_stream_reader(name, module):
+    path = os.path.join(TEST_DIR, name)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await module.aparse(AsyncStreamReader(reader))
+
+    assert repr(asyncio.run(run())) == repr(dzfile.parse(path))
+
+
+def test_async_reader_requires_read():
+    class Incomplete(AsyncReader):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+class Item(Serializer):
+    tag: BYTE
+    value: WORD
+
+
+class Items(Serializer):
+    count: BYTE
+    items: ARRAY(Item, -1)
+
+
+@pytest.mark.parametrize('n', [0, 1, 5])
+def test_variable_array_parity(tmp_path, n):
+    data = bytes([n]) + b''.join(bytes([i]) + (i * 257).to_bytes(2, 'little') for i in range(n))
+    path = tmp_path / 'items.bin'
+    path.write_bytes(data)
+
+    async def run():
+        stream = AsyncFileReader(str(path))
+        # 文件在第一次读取时才在线程池中打开
+        assert stream.file is None
+        try:
+            return await Items.aparse(stream)
+        finally:
+            await stream.close()
+
+    stream = FileReader(str(path))
+    expected = Items.parse(stream)
+    stream.close()
+    assert [(item.tag, item.value) for item in expected.items] == [(i, i * 257) for i in range(n)]
+    assert repr(Items.parse(BytesReader(data))) == repr(expected)
+    assert repr(asyncio.run(run())) == repr(expected)
@@ -0,0 +1,141 @@
+import contextlib
+import hashlib
+import os
+import shutil
+from unittest import mock
+
+import pytest
+
+import dzfile
+from dzfile import Blob, FileWriter
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def big_file(tmp_path):
+    data = os.urandom(3 << 20)
+    path = tmp_path / 'big.xyz'
+    path.write_bytes(data)
+    return str(path), data
+
+
+def test_parse_returns_blob_above_threshold(big_file):
+    path, data = big_file
+    result = dzfile.parse(path, blob_threshold=1 << 20)
+    assert isinstance(result.data, Blob)
+    assert len(result.data) == len(data)
+    assert dzfile.parse(path, blob_threshold=None).data == data
+
+
+def test_blob_access(big_file):
+    path, data = big_file
+    blob = Blob(path, 0, len(data))
+    assert blob == data
+    assert bytes(blob) == data
+    assert b''.join(blob.chunks(1000)) == data
+    assert bytes(blob[10:20]) == data[10:20]
+    assert blob[5] == data[5] and blob[-1] == data[-1]
+    assert blob[::3] == data[::3]
+    assert blob.hash('sha256').digest() == hashlib.sha256(data).digest()
+    buffer = bytearray(100)
+    assert blob[7:].readinto(buffer) == 100
+    assert buffer == data[7:107]
+    assert blob != data[:-1]
+
+
+@pytest.mark.parametrize('disabled', [(), ('copy_file_range',), ('copy_file_range', 'sendfile')])
+def test_dump_round_trip(big_file, tmp_path, disabled):
+    path, data = big_file
+    result = dzfile.parse(path, blob_threshold=1 << 20)
+    out_path = str(tmp_path / 'out.xyz')
+    with contextlib.ExitStack() as stack:
+        for name in disabled:
+            stack.enter_context(mock.patch.object(os, name, side_effect=OSError(18, 'disabled')))
+        writer = FileWriter(out_path)
+        writer.DATA(b'head')
+        result.dump(writer)
+        writer.DATA(b'tail')
+        writer.close()
+    with open(out_path, 'rb') as f:
+        assert f.read() == b'head' + data + b'tail'
+
+
+def test_dump_in_place(big_file):
+    path, data = big_file
+    result = dzfile.parse(path, blob_threshold=1 << 20)
+    writer = FileWriter(path)
+    result.dump(writer)
+    writer.close()
+    with open(path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_dump_bitmap_in_place(tmp_path):
+    path = str(tmp_path / 'copy.bmp')
+    shutil.copy(os.path.join(TEST_DIR, '30755992.bmp'), path)
+    bitmap = dzfile.parse(path)
+    writer = FileWriter(path)
+    bitmap.dump(writer)
+    writer.close()
+    with open(path, 'rb') as f, open(os.path.join(TEST_DIR, '30755992.bmp'), 'rb') as g:
+        assert f.read() == g.read()
+
+
+def test_dump_into_own_source_raises(big_file):
+    path, _ = big_file
+    blob = dzfile.parse(path, blob_threshold=1 << 20).data
+    with open(path, 'r+b') as f:
+        with pytest.raises(ValueError):
+            FileWriter(f).DATA(blob)
+
+
+def test_dump_short_source_raises(big_file, tmp_path):
+    path, _ = big_file
+    blob = dzfile.parse(path, blob_threshold=1 << 20).data
+    with open(path, 'r+b') as f:
+        f.truncate(100)
+    writer = FileWriter(str(tmp_path / 'out.xyz'))
+    with pytest.raises(OSError):
+        writer.DATA(blob)
+    writer.close()
+
+
+def test_unclosed_in_place_dump_discarded(big_file):
+    path, data = big_file
+    blob = dzfile.parse(path, blob_threshold=1 << 20).data
+    writer = FileWriter(path)
+    writer.DATA(b'par')
+    del writer
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert blob == data
+    assert [name for name in os.listdir(os.path.dirname(path)) if name.endswith('.tmp')] == []
+
+
+def test_plain_dump_writes_in_place(tmp_path):
+    path = tmp_path / 'orig.bin'
+    path.write_bytes(b'old')
+    link = tmp_path / 'link.bin'
+    os.link(path, link)
+    writer = FileWriter(str(path))
+    writer.DATA(b'new')
+    writer.close()
+    assert link.read_bytes() == b'new'
+
+
+def test_blob_source_survives_chdir(big_file, tmp_path, monkeypatch):
+    path, data = big_file
+    monkeypatch.chdir(os.path.dirname(path))
+    blob = dzfile.parse(os.path.basename(path), blob_threshold=1 << 20).data
+    monkeypatch.chdir(tmp_path.parent)
+    assert blob == data
+
+
+def test_blob_eq_truncated_source(big_file, tmp_path):
+    path, data = big_file
+    copy = str(tmp_path / 'copy.xyz')
+    shutil.copy(path, copy)
+    with open(copy, 'r+b') as f:
+        f.truncate(len(data) // 2)
+    assert Blob(path, 0, len(data)) != Blob(copy, 0, len(data))
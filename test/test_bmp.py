@@ -0,0 +1,40 @@
+import io
+import os
+
+import pytest
+
+from dzfile import BMPSerializer, BytesReader, FileWriter
+
+PALETTE = bytes(range(4 * 16))
+
+
+def line_pixels(line, bit_count: int) -> bytes:
+    if bit_count < 8 or bit_count == 16:
+        return line.imageData
+    if bit_count == 8:
+        return line.colorIndex
+    if bit_count == 24:
+        return bytes(b for color in line.colors for b in (color.blue, color.green, color.red))
+    return bytes(b for color in line.colors for b in (color.blue, color.green, color.red, color.reserved))
+
+
+@pytest.mark.parametrize('bit_count', [1, 4, 8, 16, 24, 32])
+@pytest.mark.parametrize('width, height', [(1, 3), (3, -2), (7, 5), (13, -4)])
+def test_encode_parse_dump(bit_count, width, height):
+    bytes_per_line = (width * bit_count + 7) // 8
+    pixels = os.urandom(bytes_per_line * abs(height))
+    palette = PALETTE if bit_count <= 8 else b''
+    data = BMPSerializer.encode(pixels, width, height, bit_count, palette)
+
+    stream = BytesReader(data)
+    assert BMPSerializer.validate(stream, len(data)) == []
+    stream.seek(0)
+    bitmap = BMPSerializer.parse(stream)
+    assert stream.tell() == len(data)
+    assert len(bitmap.lines) == abs(height)
+    for i, line in enumerate(bitmap.lines):
+        assert line_pixels(line, bit_count) == pixels[i * bytes_per_line:(i + 1) * bytes_per_line]
+
+    output = io.BytesIO()
+    bitmap.dump(FileWriter(output))
+    assert output.getvalue() == data
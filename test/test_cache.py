@@ -0,0 +1,101 @@
+import os
+import shutil
+import time
+
+import pytest
+
+import dzfile
+from dzfile import FileWriter
+from dzfile.Cache import ParseCache
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+BMP_PATH = os.path.join(TEST_DIR, '30755992.bmp')
+DHT_PATH = os.path.join(TEST_DIR, 'dht.dat')
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    first = cache.parse(BMP_PATH)
+    second = cache.parse(BMP_PATH)
+    assert repr(first) == repr(second) == repr(dzfile.parse(BMP_PATH))
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_cached_result_dumps(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    cache.parse(BMP_PATH)
+    bitmap = cache.parse(BMP_PATH)
+    out_path = str(tmp_path / 'out.bmp')
+    writer = FileWriter(out_path)
+    bitmap.dump(writer)
+    writer.close()
+    with open(out_path, 'rb') as f, open(BMP_PATH, 'rb') as g:
+        assert f.read() == g.read()
+
+
+def test_modified_file_misses(tmp_path):
+    path = str(tmp_path / 'dht.dat')
+    shutil.copy(DHT_PATH, path)
+    cache = ParseCache(str(tmp_path / 'cache'))
+    cache.parse(path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    cache.parse(path)
+    assert cache.stats()['misses'] == 2
+
+
+def test_eviction(tmp_path):
+    directory = str(tmp_path / 'cache')
+    cache = ParseCache(directory)
+    cache.parse(BMP_PATH)
+    time.sleep(0.01)
+    cache.parse(DHT_PATH)
+    dht_size = min(stat.st_size for _, stat in cache._entries())
+    # 以更小的`max_size`打开时立即淘汰最久未使用的条目
+    small = ParseCache(directory, max_size=dht_size)
+    assert small.stats()['entries'] == 1
+    small.parse(DHT_PATH)
+    assert small.stats()['hits'] == 1
+
+
+def test_stale_tmp_removed(tmp_path):
+    directory = tmp_path / 'cache'
+    directory.mkdir()
+    stale = directory / 'stale.tmp'
+    stale.write_bytes(b'x')
+    os.utime(stale, (0, 0))
+    fresh = directory / 'fresh.tmp'
+    fresh.write_bytes(b'x')
+    ParseCache(str(directory))
+    assert not stale.exists()
+    assert fresh.exists()
+
+
+def test_new_directory_is_private(tmp_path):
+    directory = tmp_path / 'cache'
+    ParseCache(str(directory))
+    assert directory.stat().st_mode & 0o077 == 0
+
+
+def test_shared_directory_refused(tmp_path):
+    directory = tmp_path / 'shared'
+    directory.mkdir()
+    directory.chmod(0o777)
+    with pytest.raises(PermissionError):
+        ParseCache(str(directory))
+
+
+def test_store_scans_only_over_limit(tmp_path, monkeypatch):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scans.append(path) or scandir(path))
+    cache.parse(BMP_PATH)
+    cache.parse(DHT_PATH)
+    assert scans == []
+    cache.max_size = cache.size - 1
+    cache.parse(BMP_PATH)
+    cache.parse(os.path.join(TEST_DIR, 'time32_t'))
+    assert len(scans) == 1
+    assert cache.size <= cache.max_size
@@ -0,0 +1,67 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+import dzfile
+from dzfile import BMPSerializer, DHTSerializer, PositionalReader
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+BMP_PATH = os.path.join(TEST_DIR, '30755992.bmp')
+DHT_PATH = os.path.join(TEST_DIR, 'dht.dat')
+
+CASES = [(BMP_PATH, BMPSerializer, 'lines'), (DHT_PATH, DHTSerializer, 'contents')]
+
+
+@pytest.fixture(params=['pread', 'lseek'])
+def no_pread(request, monkeypatch):
+    # 模拟没有`os.pread`的平台
+    if request.param == 'lseek':
+        monkeypatch.delattr(os, 'pread')
+
+
+def test_fork_positions_independent(no_pread):
+    with open(BMP_PATH, 'rb') as f:
+        data = f.read()
+    reader = PositionalReader(BMP_PATH)
+    child = reader.fork(100)
+    assert reader.DATA(4) == data[:4]
+    assert child.DATA(4) == data[100:104]
+    assert reader.peek(2)[:2] == data[4:6] and reader.tell() == 4
+    assert child.DATA(-1) == data[104:]
+    child.close()
+    assert reader.DATA(4) == data[4:8]
+    reader.close()
+
+
+def test_reader_pickles_by_name():
+    reader = PositionalReader(BMP_PATH)
+    reader.seek(10)
+    clone = pickle.loads(pickle.dumps(reader))
+    assert clone.tell() == 10 and clone.DATA(4) == reader.DATA(4)
+    clone.close()
+    reader.close()
+
+
+@pytest.mark.parametrize('path, module, field', CASES)
+def test_parse_parallel_threads(no_pread, path, module, field):
+    expected = dzfile.parse(path)
+    with ThreadPoolExecutor(3) as executor:
+        result = module.parse_parallel(path, 3, executor)
+    assert repr(getattr(result, field)) == repr(getattr(expected, field))
+    assert repr(result) == repr(expected)
+
+
+@pytest.mark.parametrize('path, module, field', CASES)
+def test_parse_parallel_processes(path, module, field):
+    expected = dzfile.parse(path)
+    with ProcessPoolExecutor(2) as executor:
+        result = module.parse_parallel(path, 4, executor)
+    assert repr(getattr(result, field)) == repr(getattr(expected, field))
+    assert repr(result) == repr(expected)
+
+
+@pytest.mark.parametrize('path, module, field', CASES)
+def test_parse_parallel_serial_without_executor(path, module, field):
+    assert repr(module.parse_parallel(path)) == repr(dzfile.parse(path))
@@ -0,0 +1,114 @@
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from importlib import metadata
+
+import pytest
+
+import dzfile
+from dzfile import DefaultSerializer
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+BMP_PATH = os.path.join(TEST_DIR, '30755992.bmp')
+DHT_PATH = os.path.join(TEST_DIR, 'dht.dat')
+
+FAKE_FORMAT = '''
+from dzfile.Common import *
+
+MAGIC = b'FAKE'
+
+
+class Fake(Serializer):
+    magic: DATA(4)
+    value: DWORD
+
+
+def parse(stream):
+    return Fake.parse(stream)
+'''
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # 每个测试使用独立的注册表，避免entry point的读取状态互相影响
+    monkeypatch.setattr(dzfile, 'format_modules', dict(dzfile.format_modules))
+    monkeypatch.setattr(dzfile, 'magic_formats', dict(dzfile.magic_formats))
+    monkeypatch.setattr(dzfile, 'parse_handlers', dict(dzfile.parse_handlers))
+    monkeypatch.setattr(dzfile, '_entry_points_loaded', False)
+    monkeypatch.setattr(dzfile, '_entry_point_formats', [])
+
+
+@pytest.fixture
+def fake_entry_point(registry, tmp_path, monkeypatch):
+    (tmp_path / 'fakefmt.py').write_text(FAKE_FORMAT)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    ep = metadata.EntryPoint(name='fake', value='fakefmt', group=dzfile.ENTRY_POINT_GROUP)
+    calls = []
+
+    def entry_points(**params):
+        calls.append(params)
+        # 放大读取entry point的耗时，使并发的识别在读取完成前发生
+        time.sleep(0.05)
+        return [ep] if params.get('group') == dzfile.ENTRY_POINT_GROUP else []
+
+    monkeypatch.setattr(metadata, 'entry_points', entry_points)
+    path = tmp_path / 'sample.unknown'
+    path.write_bytes(b'FAKE' + (7).to_bytes(4, 'little'))
+    return str(path), calls
+
+
+def test_import_is_lazy():
+    code = ('import sys, dzfile; '
+            'assert "dzfile.BMPSerializer" not in sys.modules; '
+            'assert "importlib.metadata" not in sys.modules; '
+            'dzfile.BMPSerializer; '
+            'assert "dzfile.BMPSerializer" in sys.modules')
+    subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(TEST_DIR), check=True)
+
+
+@pytest.mark.parametrize('source, name, expected', [
+    (BMP_PATH, 'image.bin', 'BMP'),
+    (DHT_PATH, 'table', 'ARIA2DHT'),
+])
+def test_sniff_format(tmp_path, source, name, expected):
+    path = str(tmp_path / name)
+    shutil.copy(source, path)
+    assert dzfile.sniff_format(path) == expected
+    assert repr(dzfile.parse(path)) == repr(dzfile.parse(source))
+
+
+def test_sniff_rejects_implausible_magic(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_bytes(b'BMW owners club\n' * 8)
+    assert dzfile.sniff_format(str(path)) is None
+    assert dzfile.sniff_format(str(path), check=False) == 'BMP'
+    assert dzfile.resolve_parse_handler(str(path)) == (None, DefaultSerializer.parse)
+
+
+def test_entry_point_format(fake_entry_point):
+    path, calls = fake_entry_point
+    assert dzfile.parse(path, 'FAKE').value == 7
+    assert dzfile.sniff_format(path) == 'FAKE'
+    assert dzfile.parse(path).value == 7
+    assert len(calls) == 1
+
+
+def test_entry_point_threads(fake_entry_point):
+    path, calls = fake_entry_point
+    barrier = threading.Barrier(8)
+    results = []
+
+    def work():
+        barrier.wait()
+        results.append(dzfile.sniff_format(path))
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['FAKE'] * 8
+    assert len(calls) == 1
@@ -0,0 +1,80 @@
+import os
+import shutil
+
+import dzfile
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+BMP_PATH = os.path.join(TEST_DIR, '30755992.bmp')
+DHT_PATH = os.path.join(TEST_DIR, 'dht.dat')
+
+
+def copy_truncated(source: str, path, size: int) -> str:
+    with open(source, 'rb') as f:
+        path.write_bytes(f.read(size))
+    return str(path)
+
+
+def validate_one(path: str) -> dzfile.ValidateResult:
+    [result] = dzfile.validate([path])
+    return result
+
+
+def test_valid_files():
+    for path, file_format in ((BMP_PATH, 'BMP'), (DHT_PATH, 'ARIA2DHT')):
+        result = validate_one(path)
+        assert (result.format, result.problems, result.ok) == (file_format, [], True)
+
+
+def test_truncated_bmp(tmp_path):
+    path = copy_truncated(BMP_PATH, tmp_path / 'short.bmp', os.path.getsize(BMP_PATH) - 100)
+    result = validate_one(path)
+    assert result.format == 'BMP' and result.ok is False
+    assert any('bfSize' in problem for problem in result.problems)
+    assert any('图像数据' in problem for problem in result.problems)
+
+
+def test_bad_off_bits(tmp_path):
+    path = tmp_path / 'offbits.bmp'
+    shutil.copy(BMP_PATH, path)
+    with open(path, 'r+b') as f:
+        f.seek(10)
+        f.write((1 << 30).to_bytes(4, 'little'))
+    result = validate_one(str(path))
+    assert result.ok is False
+    assert any('bfOffBits' in problem for problem in result.problems)
+
+
+def test_truncated_dht(tmp_path):
+    path = copy_truncated(DHT_PATH, tmp_path / 'short.dat', os.path.getsize(DHT_PATH) - 1)
+    result = validate_one(path)
+    assert result.format == 'ARIA2DHT' and result.ok is False
+    assert any('numNode' in problem for problem in result.problems)
+
+
+def test_missing_path(tmp_path):
+    result = validate_one(str(tmp_path / 'missing.bmp'))
+    assert result.ok is False
+    assert result.problems[0].startswith('FileNotFoundError')
+
+
+def test_unknown_format_not_ok(tmp_path):
+    path = tmp_path / 'notes'
+    path.write_bytes(b'plain text\n')
+    result = validate_one(str(path))
+    assert (result.format, result.problems, result.ok) == (None, None, None)
+
+
+def test_order_with_workers(tmp_path):
+    paths = []
+    for i in range(40):
+        source = (BMP_PATH, DHT_PATH)[i % 2]
+        path = tmp_path / f'{i}{os.path.splitext(source)[1]}'
+        if i % 3 == 0:
+            copy_truncated(source, path, 20)
+        else:
+            shutil.copy(source, path)
+        paths.append(str(path))
+    paths.append(str(tmp_path / 'missing.bmp'))
+    results = list(dzfile.validate(paths, workers=4))
+    assert [result.path for result in results] == paths
+    assert [result.ok for result in results] == [i % 3 != 0 for i in range(40)] + [False]